@@ -1,13 +1,42 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+from plotly.offline import get_plotlyjs_version
 from plotly.subplots import make_subplots
+import argparse
+import base64
+import gzip
+import hashlib
+import html
 import os
+import re
+from string import Template
+
+try:
+    import pyarrow as pa  # optional: multithreaded CSV reader and C++ group-by kernels
+except ImportError:
+    pa = None
+CSV_ENGINE = 'c' if pa is None else 'pyarrow'
+
+# Dispatch pandas reductions/arithmetic to bottleneck and numexpr; pandas only
+# honours these when the packages are installed, so they stay optional
+pd.set_option('compute.use_bottleneck', True)
+pd.set_option('compute.use_numexpr', True)
 
 # -----------------------------------------------------------------------------
 # 1. Data Loading & Preprocessing
 # -----------------------------------------------------------------------------
 FILE_PATH = '국민연금공단_시군구별 청년계층 가입자 현황_20241231.csv'
+COUNT_COLUMNS = ['사업장가입자', '지역가입자', '임의가입자', '임의계속가입자']
+OUTPUT_FILE = 'national_pension_analysis_report.html'
+CACHE_KEY_FILE = OUTPUT_FILE + '.key'
+
+parser = argparse.ArgumentParser(description='국민연금 청년계층 가입자 현황 보고서 생성')
+parser.add_argument('--static', action='store_true',
+                    help='embed the charts as PNG images rendered by Kaleido instead of interactive Plotly figures')
+args = parser.parse_args()
 
 if not os.path.exists(FILE_PATH):
     print(f"Error: File not found at {FILE_PATH}")
@@ -15,65 +44,149 @@ if not os.path.exists(FILE_PATH):
     # For now, we assume file exists as per user context.
     exit(1)
 
-df = pd.read_csv(FILE_PATH, encoding='cp949')
-df['시도'] = df['시군구명'].apply(lambda x: x.split()[0])
+# Skip the whole rebuild when neither the input data, this script nor the output mode has changed
+hasher = hashlib.blake2b(digest_size=16)
+for path in (FILE_PATH, __file__):
+    with open(path, 'rb') as f:
+        hasher.update(f.read())
+hasher.update(b'static' if args.static else b'interactive')
+cache_key = hasher.hexdigest()
+
+if os.path.exists(OUTPUT_FILE) and os.path.exists(CACHE_KEY_FILE):
+    with open(CACHE_KEY_FILE, encoding='utf-8') as f:
+        if f.read().strip() == cache_key:
+            print(f"Report is up to date: {OUTPUT_FILE}")
+            exit(0)
+
+# Fixed schema: subscriber counts fit comfortably in int32, so give every column
+# an explicit dtype and skip pandas' type inference pass
+CSV_DTYPES = {'시군구명': 'string', '연령(구분)': 'category', **dict.fromkeys(COUNT_COLUMNS, 'int32')}
+df = pd.read_csv(FILE_PATH, encoding='cp949', engine=CSV_ENGINE,
+                 usecols=list(CSV_DTYPES), dtype=CSV_DTYPES)
+# 시군구명 repeats once per age band: split only the distinct names, then
+# broadcast the result back through the factorized codes
+codes, names = df['시군구명'].factorize()
+sido = pd.Categorical(names.str.split(' ', n=1).str.get(0))
+# (missing names keep factorize's -1 sentinel, i.e. NaN, rather than wrapping around)
+df['시도'] = pd.Categorical.from_codes(np.where(codes < 0, -1, sido.codes[codes]), sido.categories)
 
 # -----------------------------------------------------------------------------
 # 2. Visualizations
 # -----------------------------------------------------------------------------
 
-# Fig 1: Sunburst Chart (Age Groups)
-df_melted = df.melt(id_vars=['연령(구분)', '시도'], 
-                    value_vars=['사업장가입자', '지역가입자', '임의가입자', '임의계속가입자'],
-                    var_name='가입유형', value_name='가입자수')
+# Shared figure styling, resolved once (treat as read-only)
+PASTEL = px.colors.qualitative.Pastel
+CHART_MARGIN = dict(t=40, l=0, r=0, b=0)
+# px.sunburst hands out a discrete palette in an order that depends on the input rows
+# (and the pandas version); pin it. '(?)' is the colour of the mixed age-band rings.
+AGE_COLORS = {'사업장가입자': PASTEL[0], '(?)': PASTEL[1], '지역가입자': PASTEL[2],
+              '임의계속가입자': PASTEL[3], '임의가입자': PASTEL[4]}
 
-fig_age = px.sunburst(df_melted, path=['연령(구분)', '가입유형'], values='가입자수',
-                    title='연령대별 국민연금 가입 구조',
-                    color='가입유형', color_discrete_sequence=px.colors.qualitative.Pastel)
-fig_age.update_layout(margin=dict(t=40, l=0, r=0, b=0))
+# Fig 1: Sunburst Chart (Age Groups)
+def build_age(df):
+    df_age = (df.groupby('연령(구분)', observed=True, sort=False)
+                [COUNT_COLUMNS]
+                .sum()
+                .stack()
+                .rename_axis(['연령(구분)', '가입유형'])
+                .reset_index(name='가입자수'))
+    # Same as the treemap: px's own groupby over the path runs without observed=True,
+    # so hand it plain labels rather than the categorical
+    df_age['연령(구분)'] = df_age['연령(구분)'].astype(str)
+
+    fig = px.sunburst(df_age, path=['연령(구분)', '가입유형'], values='가입자수',
+                      title='연령대별 국민연금 가입 구조',
+                      color='가입유형', color_discrete_map=AGE_COLORS)
+    fig.update_layout(margin=CHART_MARGIN)
+    return fig
 
 # Fig 2: Treemap (Regional)
-fig_region = px.treemap(df, path=[px.Constant("전국"), '시도', '시군구명'], 
-                       values='사업장가입자',
-                       color='사업장가입자',
-                       color_continuous_scale='Blues',
-                       title='전국 청년 일자리(사업장 가입자) 지도')
-fig_region.update_layout(margin=dict(t=40, l=0, r=0, b=0))
+def build_region(df):
+    # px colours every node by the value-weighted mean of its colour column. Over the raw
+    # age-band rows that is sum(x**2) / sum(x); carry that per leaf so the pre-aggregated
+    # frame keeps the same leaf and parent colours (and colour bar range)
+    rows = df[['시도', '시군구명', '사업장가입자']].assign(제곱합=df['사업장가입자'].astype('float64') ** 2)
+    df_tree = rows.groupby(['시도', '시군구명'], observed=True, sort=False, as_index=False)[['사업장가입자', '제곱합']].sum()
+    df_tree['색상'] = df_tree.pop('제곱합') / df_tree['사업장가입자']
+    # px.treemap groups on every path level itself; with a categorical 시도 older pandas
+    # (observed=False) would expand that into every 시도 x 시군구명 combination
+    df_tree['시도'] = df_tree['시도'].astype(str)
+    df_tree['전국'] = '전국'
+
+    fig = px.treemap(df_tree, path=['전국', '시도', '시군구명'],
+                     values='사업장가입자',
+                     color='색상',
+                     color_continuous_scale='Blues',
+                     labels={'사업장가입자': '사업장가입자_sum', '색상': '사업장가입자'},
+                     title='전국 청년 일자리(사업장 가입자) 지도')
+    # px only treats signed int/float columns as continuous; anything else (e.g. uint)
+    # silently falls back to a qualitative palette with no colour bar
+    if fig.layout.coloraxis.colorscale is None:
+        raise TypeError(f"treemap colour column has non-continuous dtype {df_tree['색상'].dtype}")
+    fig.update_layout(margin=CHART_MARGIN)
+    return fig
 
 # Fig 3: Bubble Chart (Comparison)
-city_sum = df.groupby('시도').agg({
-    '사업장가입자': 'sum',
-    '지역가입자': 'sum',
-    '임의가입자': 'sum'
-}).reset_index()
-
-fig_compare = px.scatter(city_sum, x="지역가입자", y="사업장가입자",
-                 size="사업장가입자", color="시도",
-                 hover_name="시도", log_x=True, size_max=60,
-                 title="지역별 고용 안정성 vs 자영업 비율",
-                 labels={"사업장가입자": "직장인 가입자 수", "지역가입자": "자영업/프리랜서 가입자 수"})
-fig_compare.update_layout(margin=dict(t=40, l=0, r=0, b=0))
+def sum_by_category(df, key, columns):
+    """groupby(key).sum() for a categorical key: one stable sort of the codes, then np.add.reduceat."""
+    codes = df[key].cat.codes.to_numpy()
+    # Rows with a missing key (code -1) are dropped, as groupby would
+    order = np.flatnonzero(codes >= 0)
+    order = order[np.argsort(codes[order], kind='stable')]
+    if not len(order):
+        return pd.DataFrame({key: df[key].cat.categories[:0],
+                             **{c: np.array([], dtype=np.int64) for c in columns}})
+    codes_sorted = codes[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(codes_sorted)) + 1))
+    sums = {c: np.add.reduceat(df[c].to_numpy()[order], starts, dtype=np.int64) for c in columns}
+    return pd.DataFrame({key: df[key].cat.categories[codes_sorted[starts]], **sums})
+
+def sum_by_group(df, key, columns):
+    """groupby(key).sum() through Arrow's hash aggregation when pyarrow is available."""
+    if pa is None:
+        return sum_by_category(df, key, columns)
+    table = pa.Table.from_pandas(df[[key, *columns]], preserve_index=False)
+    result = table.group_by(key).aggregate([(c, 'sum') for c in columns])
+    return (result.select([key, *(f'{c}_sum' for c in columns)])
+                  .rename_columns([key, *columns])
+                  .to_pandas()
+                  .sort_values(key, ignore_index=True))
+
+def build_compare(df):
+    city_sum = sum_by_group(df, '시도', ['사업장가입자', '지역가입자', '임의가입자'])
+
+    fig = px.scatter(city_sum, x="지역가입자", y="사업장가입자",
+                     size="사업장가입자", color="시도",
+                     hover_name="시도", log_x=True, size_max=60,
+                     render_mode='webgl',
+                     # Legend order (and so each 시도's colour) stays alphabetical, as with
+                     # the original sorted groupby, whatever order city_sum comes back in
+                     category_orders={'시도': sorted(city_sum['시도'].astype(str))},
+                     title="지역별 고용 안정성 vs 자영업 비율",
+                     labels={"사업장가입자": "직장인 가입자 수", "지역가입자": "자영업/프리랜서 가입자 수"})
+    fig.update_layout(margin=CHART_MARGIN)
+    return fig
+
+fig_age = build_age(df)
+fig_region = build_region(df)
+fig_compare = build_compare(df)
 
 
 # -----------------------------------------------------------------------------
 # 3. HTML Generation (Quarto Styling)
 # -----------------------------------------------------------------------------
 
-# Convert figures to HTML divs (excluding full html, just the div)
-div_age = fig_age.to_html(full_html=False, include_plotlyjs='cdn')
-div_region = fig_region.to_html(full_html=False, include_plotlyjs=False) # JS already included in first call
-div_compare = fig_compare.to_html(full_html=False, include_plotlyjs=False)
-
-# Quarto-like CSS & Layout Template
-html_template = f"""
-<!DOCTYPE html>
-<html lang="ko">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>국민연금 청년계층 데이터 분석 보고서</title>
-    <style>
-        :root {{
+def minify_css(css):
+    """Strip comments and insignificant whitespace from a stylesheet."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+# Report stylesheet, kept readable here and minified once at import
+CSS = minify_css("""
+        :root {
             --sidebar-width: 300px;
             --main-max-width: 900px;
             --font-main: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
@@ -82,18 +195,18 @@ html_template = f"""
             --color-link: #007bff;
             --color-border: #e9ecef;
             --color-sidebar-bg: #f8f9fa;
-        }}
+        }
 
-        body {{
+        body {
             font-family: var(--font-main);
             color: var(--color-text);
             margin: 0;
             display: flex;
             min-height: 100vh;
-        }}
+        }
 
         /* Sidebar Styling */
-        .sidebar {{
+        .sidebar {
             width: var(--sidebar-width);
             background-color: var(--color-sidebar-bg);
             border-right: 1px solid var(--color-border);
@@ -102,116 +215,134 @@ html_template = f"""
             height: 100vh;
             overflow-y: auto;
             flex-shrink: 0;
-        }}
+        }
 
-        .sidebar-title {{
+        .sidebar-title {
             font-size: 1.2rem;
             font-weight: 700;
             margin-bottom: 1rem;
             color: #2c3e50;
-        }}
+        }
 
-        .sidebar-nav ul {{
+        .sidebar-nav ul {
             list-style: none;
             padding: 0;
-        }}
+        }
 
-        .sidebar-nav li {{
+        .sidebar-nav li {
             margin-bottom: 0.5rem;
-        }}
+        }
 
-        .sidebar-nav a {{
+        .sidebar-nav a {
             text-decoration: none;
             color: #555;
             font-size: 0.95rem;
             transition: color 0.2s;
-        }}
+        }
 
-        .sidebar-nav a:hover {{
+        .sidebar-nav a:hover {
             color: var(--color-link);
-        }}
+        }
         
-        .sidebar-footer {{
+        .sidebar-footer {
             margin-top: 2rem;
             font-size: 0.8rem;
             color: #888;
-        }}
+        }
 
         /* Main Content Styling */
-        .main-content {{
+        .main-content {
             flex-grow: 1;
             margin-left: var(--sidebar-width);
             padding: 2rem 4rem;
             max-width: 100%;
-        }}
+        }
 
-        .container {{
+        .container {
             max-width: var(--main-max-width);
             margin: 0 auto;
-        }}
+        }
 
-        h1 {{ 
+        h1 { 
             font-size: 2.2rem; 
             margin-bottom: 0.5rem; 
             font-weight: 700;
             border-bottom: 1px solid #eee;
             padding-bottom: 0.5rem;
-        }}
+        }
         
-        h2 {{ 
+        h2 { 
             font-size: 1.5rem; 
             margin-top: 3rem; 
             margin-bottom: 1rem; 
             color: #2c3e50;
             border-bottom: 1px solid #eee;
             padding-bottom: 0.3rem; 
-        }}
+        }
 
-        h3 {{
+        h3 {
             font-size: 1.2rem;
             margin-top: 2rem;
             color: #495057;
-        }}
+        }
 
-        p {{
+        p {
             line-height: 1.7;
             margin-bottom: 1.5rem;
             color: #444;
-        }}
+        }
 
-        .chart-container {{
+        .chart-container {
             margin: 2rem 0;
             border: 1px solid #eee;
             border-radius: 8px;
             padding: 10px;
             box-shadow: 0 2px 10px rgba(0,0,0,0.03);
             background: white;
-        }}
+        }
         
-        .callout {{
+        .chart-container img {
+            display: block;
+            width: 100%;
+            height: auto;
+        }
+
+        .callout {
             background-color: #f0f7ff;
             border-left: 5px solid #007bff;
             padding: 1rem;
             margin-bottom: 1.5rem;
             border-radius: 4px;
-        }}
+        }
 
         /* Responsive Design */
-        @media (max-width: 768px) {{
-            body {{ flex-direction: column; }}
-            .sidebar {{ 
+        @media (max-width: 768px) {
+            body { flex-direction: column; }
+            .sidebar { 
                 width: 100%; 
                 height: auto; 
                 position: relative; 
                 border-right: none;
                 border-bottom: 1px solid var(--color-border);
-            }}
-            .main-content {{ 
+            }
+            .main-content { 
                 margin-left: 0; 
                 padding: 1.5rem; 
-            }}
-        }}
-    </style>
+            }
+        }
+""")
+
+# Quarto-like Layout Template, kept in pieces so the figure payload is written
+# straight to disk instead of being spliced into one big string.
+# Compiled once; $-placeholders avoid escaping any braces in the markup.
+HTML_HEAD = Template("""
+<!DOCTYPE html>
+<html lang="ko">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>국민연금 청년계층 데이터 분석 보고서</title>
+    <style>$css</style>
 </head>
 <body>
 
@@ -264,7 +395,7 @@ html_template = f"""
                     중앙에서 바깥쪽으로 나갈수록 세부적인 분류를 보여줍니다.
                 </p>
                 <div class="chart-container">
-                    {div_age}
+                    $chart_age
                 </div>
                 <p>
                     * 차트의 섹션을 클릭하면 해당 카테고리를 확대해서 볼 수 있습니다.
@@ -278,7 +409,7 @@ html_template = f"""
                     서울 및 수도권 지역의 사각형 크기를 통해 일자리 집중 현상을 직관적으로 확인할 수 있습니다.
                 </p>
                 <div class="chart-container">
-                    {div_region}
+                    $chart_region
                 </div>
             </section>
 
@@ -289,7 +420,7 @@ html_template = f"""
                     원의 크기는 사업장 가입자(직장인)의 규모를 나타냅니다.
                 </p>
                 <div class="chart-container">
-                    {div_compare}
+                    $chart_compare
                 </div>
                 <p>
                     대각선 위쪽에 위치할수록 자영업/프리랜서 대비 직장 가입자 비율이 높은 지역으로, 상대적으로 고용 안정성이 높다고 해석할 수 있습니다.
@@ -302,12 +433,78 @@ html_template = f"""
         </div>
     </main>
 
-</body>
+""")
+
+# Interactive mode only: plotly.js and the figure payload, split around the payload
+PLOTLY_HEAD = Template("""    <script charset="utf-8" src="$plotlyjs_url"></script>
+    <script id="figures" type="application/json">""")
+
+PLOTLY_TAIL = """</script>
+    <script>
+        const {template, figures} = JSON.parse(document.getElementById('figures').textContent);
+        for (const [id, fig] of Object.entries(figures)) {
+            Plotly.react(id, fig.data, {...fig.layout, template}, {responsive: true});
+        }
+    </script>
+
+"""
+
+HTML_END = """</body>
 </html>
 """
 
-OUTPUT_FILE = 'national_pension_analysis_report.html'
-with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-    f.write(html_template)
+def embed_png(fig, width=900, height=600):
+    """Render a figure to PNG with Kaleido and inline it as a data: URI."""
+    png = fig.to_image(format='png', width=width, height=height)
+    return (f'<img src="data:image/png;base64,{base64.b64encode(png).decode("ascii")}" '
+            f'alt="{html.escape(fig.layout.title.text)}">')
+
+charts = {'age': fig_age, 'region': fig_region, 'compare': fig_compare}
+
+if args.static:
+    # Archival output: no plotly.js and no figure JSON, just one PNG per chart
+    images = {f'chart_{name}': embed_png(fig) for name, fig in charts.items()}
+    chunks = [
+        HTML_HEAD.substitute(css=CSS, **images).encode('utf-8'),
+        HTML_END.encode('utf-8'),
+    ]
+else:
+    # Serialize all figures in a single pass into one JSON payload; the page renders
+    # each one client-side with Plotly.react into its container div.
+    # Serialization goes through orjson whenever it is installed (plotly's 'auto' JSON engine).
+    figures = {f'fig-{name}': fig.to_plotly_json() for name, fig in charts.items()}
+    # Every figure carries its own copy of the same default template; ship it once
+    template = figures['fig-age']['layout']['template']
+    for fig in figures.values():
+        del fig['layout']['template']
+    # Encode straight away (the str is released as soon as it is encoded) and drop the
+    # figure dicts, so only the encoded payload stays alive through the writes
+    figures_json = to_json_plotly({'template': template, 'figures': figures}).encode('utf-8')
+    del figures, template
+    plotlyjs_url = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+    containers = {f'chart_{name}': f'<div id="fig-{name}" class="plotly-graph-div"></div>' for name in charts}
+    chunks = [
+        HTML_HEAD.substitute(css=CSS, **containers).encode('utf-8'),
+        PLOTLY_HEAD.substitute(plotlyjs_url=plotlyjs_url).encode('utf-8'),
+        figures_json,
+        PLOTLY_TAIL.encode('utf-8'),
+        HTML_END.encode('utf-8'),
+    ]
+
+# Drop the old key before touching the outputs, so a crash mid-write can never leave a
+# truncated report paired with a matching key
+if os.path.exists(CACHE_KEY_FILE):
+    os.remove(CACHE_KEY_FILE)
+
+# Only the figure payload is larger than the write buffer and goes straight to write(2);
+# the page head and the short plotly.js/closing pieces are collected in the buffer
+with open(OUTPUT_FILE, 'wb') as f:
+    f.writelines(chunks)
+# Pre-compressed copy for serving/archiving
+with gzip.open(OUTPUT_FILE + '.gz', 'wb', compresslevel=6) as f:
+    f.writelines(chunks)
+with open(CACHE_KEY_FILE, 'w', encoding='utf-8') as f:
+    f.write(cache_key)
 
 print(f"Successfully generated report: {OUTPUT_FILE}")